@@ -4,45 +4,85 @@ Performance data analysis script for stock-pulse project.
 Analyzes and compares performance results from different optimization configurations.
 """
 
-import json
+import math
 import os
+import sys
 from collections import defaultdict
 from datetime import datetime
 from typing import Dict, List, Any, Tuple
 import statistics
 
+import orjson
+
+
+def _scan_results(results_dir: str) -> List[os.DirEntry]:
+    """List result files in one directory pass, sorted by name."""
+    with os.scandir(results_dir) as it:
+        entries = [
+            entry for entry in it
+            if entry.name.startswith("performance_results_") and entry.name.endswith((".json", ".jsonl"))
+        ]
+    entries.sort(key=lambda entry: entry.name)
+    return entries
+
+
+def _parse_jsonl(f) -> List[Dict[str, Any]]:
+    """Parse a JSON Lines stream; raises ValueError naming the first bad line."""
+    records = []
+    for lineno, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            records.append(orjson.loads(line))
+        except orjson.JSONDecodeError as e:
+            raise ValueError(f"line {lineno}: {e}") from e
+    return records
+
 
 def load_all_performance_data(results_dir: str = "performance_results") -> List[Dict[str, Any]]:
-    """Load all performance results from the results directory."""
+    """Load all performance results (.json arrays or .jsonl) from the results directory."""
+    entries = _scan_results(results_dir)
+
     all_results = []
+    failed_files = []
+    
+    for entry in entries:
+        filename = entry.name
+        try:
+            with open(entry.path, "rb") as f:
+                if filename.endswith(".jsonl"):
+                    # JSON Lines: one result per line; like .json, the file loads all or nothing
+                    all_results.extend(_parse_jsonl(f))
+                    continue
+                results = orjson.loads(f.read())
+                if isinstance(results, list):
+                    all_results.extend(results)
+                else:
+                    all_results.append(results)
+        except (OSError, ValueError) as e:
+            failed_files.append((filename, e))
     
-    for filename in sorted(os.listdir(results_dir)):
-        if filename.startswith("performance_results_") and filename.endswith(".json"):
-            filepath = os.path.join(results_dir, filename)
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    results = json.load(f)
-                    if isinstance(results, list):
-                        all_results.extend(results)
-                    else:
-                        all_results.append(results)
-            except Exception as e:
-                print(f"Error loading {filename}: {e}")
+    # Report unreadable files once, after the load loop
+    for filename, e in failed_files:
+        print(f"Error loading {filename}: {e}")
     
     return all_results
 
 
+def get_config_key(result: Dict[str, Any]) -> Tuple[str, ...]:
+    """Optimization configuration key for a result; () for old data without one."""
+    optimizations = result.get("enabled_optimizations")
+    if not optimizations:
+        return ()
+    return tuple(sorted(optimizations))
+
+
 def group_by_optimization_config(data: List[Dict[str, Any]]) -> Dict[Tuple, List[Dict[str, Any]]]:
     """Group performance data by optimization configuration."""
     groups = defaultdict(list)
     
     for result in data:
-        if "enabled_optimizations" in result:
-            config_key = tuple(sorted(result["enabled_optimizations"]))
-            groups[config_key].append(result)
-        else:
-            # Handle old data without optimization config
-            groups[()].append(result)
+        groups[get_config_key(result)].append(result)
     
     return dict(groups)
 
@@ -63,6 +103,28 @@ def calculate_statistics(times: List[float]) -> Dict[str, float]:
     }
 
 
+def summarize_by_config(data: List[Dict[str, Any]]) -> Dict[Tuple, Dict[str, Dict[str, float]]]:
+    """Single pass over all results: count/mean/min/max of successful run times per (config, function)."""
+    running = defaultdict(lambda: [0, 0.0, math.inf, -math.inf])
+    
+    for r in data:
+        if not r.get("success", False):
+            continue
+        t = r["execution_time_seconds"]
+        acc = running[(get_config_key(r), r["function_name"])]
+        acc[0] += 1
+        acc[1] += t
+        if t < acc[2]:
+            acc[2] = t
+        if t > acc[3]:
+            acc[3] = t
+    
+    summaries = defaultdict(dict)
+    for (config, function_name), (n, total, lo, hi) in running.items():
+        summaries[config][function_name] = {"count": n, "mean": total / n, "min": lo, "max": hi}
+    return dict(summaries)
+
+
 def analyze_performance_data(data: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Analyze performance data and generate comprehensive report."""
     print("=" * 80)
@@ -72,18 +134,9 @@ def analyze_performance_data(data: List[Dict[str, Any]]) -> Dict[str, Any]:
     # Group by optimization configuration
     config_groups = group_by_optimization_config(data)
     
-    # Separate by function
-    function_data = defaultdict(lambda: defaultdict(list))
-    
-    for result in data:
-        function_name = result["function_name"]
-        if "enabled_optimizations" in result:
-            config_key = tuple(sorted(result["enabled_optimizations"]))
-        else:
-            config_key = ()
-        
-        if result.get("success", False):
-            function_data[function_name][config_key].append(result["execution_time_seconds"])
+    # Per-(config, function) run stats in one pass, ordered like config_groups
+    summaries = summarize_by_config(data)
+    config_summaries = {config_key: summaries.get(config_key, {}) for config_key in config_groups}
     
     # Generate report
     report = {
@@ -106,69 +159,74 @@ def analyze_performance_data(data: List[Dict[str, Any]]) -> Dict[str, Any]:
         config_name = ", ".join(config_key) if config_key else "baseline (no optimizations)"
         successful_results = [r for r in results if r.get("success", False)]
         
-        print(f"\nConfiguration: {config_name}")
-        print(f"  Total runs: {len(results)}")
-        print(f"  Successful runs: {len(successful_results)}")
+        # Buffer this configuration's block and write it once
+        lines = [
+            f"\nConfiguration: {config_name}",
+            f"  Total runs: {len(results)}",
+            f"  Successful runs: {len(successful_results)}",
+        ]
         
         if successful_results:
-            # Separate by function
-            market_watch_times = [r["execution_time_seconds"] for r in successful_results 
-                                if r["function_name"] == "get_market_watch_data"]
-            price_change_times = [r["execution_time_seconds"] for r in successful_results 
-                                if r["function_name"] == "get_price_change"]
+            # Separate by function in a single pass
+            market_watch_times = []
+            price_change_times = []
+            for r in successful_results:
+                if r["function_name"] == "get_market_watch_data":
+                    market_watch_times.append(r["execution_time_seconds"])
+                elif r["function_name"] == "get_price_change":
+                    price_change_times.append(r["execution_time_seconds"])
             
             if market_watch_times:
                 mw_stats = calculate_statistics(market_watch_times)
-                print(f"  Market Watch Data:")
-                print(f"    Average: {mw_stats['mean']:.3f}s")
-                print(f"    Median:  {mw_stats['median']:.3f}s")
-                print(f"    Min:     {mw_stats['min']:.3f}s")
-                print(f"    Max:     {mw_stats['max']:.3f}s")
-                print(f"    Std Dev: {mw_stats['stdev']:.3f}s")
+                lines += [
+                    f"  Market Watch Data:",
+                    f"    Average: {mw_stats['mean']:.3f}s",
+                    f"    Median:  {mw_stats['median']:.3f}s",
+                    f"    Min:     {mw_stats['min']:.3f}s",
+                    f"    Max:     {mw_stats['max']:.3f}s",
+                    f"    Std Dev: {mw_stats['stdev']:.3f}s",
+                ]
             
             if price_change_times:
                 pc_stats = calculate_statistics(price_change_times)
-                print(f"  Price Change:")
-                print(f"    Average: {pc_stats['mean']:.3f}s")
-                print(f"    Median:  {pc_stats['median']:.3f}s")
-                print(f"    Min:     {pc_stats['min']:.3f}s")
-                print(f"    Max:     {pc_stats['max']:.3f}s")
-                print(f"    Std Dev: {pc_stats['stdev']:.3f}s")
+                lines += [
+                    f"  Price Change:",
+                    f"    Average: {pc_stats['mean']:.3f}s",
+                    f"    Median:  {pc_stats['median']:.3f}s",
+                    f"    Min:     {pc_stats['min']:.3f}s",
+                    f"    Max:     {pc_stats['max']:.3f}s",
+                    f"    Std Dev: {pc_stats['stdev']:.3f}s",
+                ]
+        
+        sys.stdout.write("\n".join(lines) + "\n")
     
     # Find best performing configurations
     print(f"\n🏆 BEST PERFORMING CONFIGURATIONS:")
     print("-" * 60)
     
-    # Market Watch Data
     mw_best_config = None
     mw_best_time = float('inf')
+    pc_best_config = None
+    pc_best_time = float('inf')
     
-    for config_key, results in config_groups.items():
-        mw_times = [r["execution_time_seconds"] for r in results 
-                   if r["function_name"] == "get_market_watch_data" and r.get("success", False)]
-        if mw_times:
-            avg_time = statistics.mean(mw_times)
+    for config_key, summary in config_summaries.items():
+        if "get_market_watch_data" in summary:
+            avg_time = summary["get_market_watch_data"]["mean"]
             if avg_time < mw_best_time:
                 mw_best_time = avg_time
                 mw_best_config = config_key
+        if "get_price_change" in summary:
+            avg_time = summary["get_price_change"]["mean"]
+            if avg_time < pc_best_time:
+                pc_best_time = avg_time
+                pc_best_config = config_key
     
+    # Market Watch Data
     if mw_best_config:
         config_name = ", ".join(mw_best_config) if mw_best_config else "baseline (no optimizations)"
         print(f"Market Watch Data: {config_name} ({mw_best_time:.3f}s avg)")
     
     # Price Change
-    pc_best_config = None
-    pc_best_time = float('inf')
-    
-    for config_key, results in config_groups.items():
-        pc_times = [r["execution_time_seconds"] for r in results 
-                   if r["function_name"] == "get_price_change" and r.get("success", False)]
-        if pc_times:
-            avg_time = statistics.mean(pc_times)
-            if avg_time < pc_best_time:
-                pc_best_time = avg_time
-                pc_best_config = config_key
-    
     if pc_best_config:
         config_name = ", ".join(pc_best_config) if pc_best_config else "baseline (no optimizations)"
         print(f"Price Change: {config_name} ({pc_best_time:.3f}s avg)")
@@ -210,37 +268,30 @@ def analyze_performance_data(data: List[Dict[str, Any]]) -> Dict[str, Any]:
             break
     
     if baseline_config is not None:
-        baseline_results = config_groups[baseline_config]
-        baseline_mw_times = [r["execution_time_seconds"] for r in baseline_results 
-                           if r["function_name"] == "get_market_watch_data" and r.get("success", False)]
-        baseline_pc_times = [r["execution_time_seconds"] for r in baseline_results 
-                           if r["function_name"] == "get_price_change" and r.get("success", False)]
-        
-        baseline_mw_avg = statistics.mean(baseline_mw_times) if baseline_mw_times else 0
-        baseline_pc_avg = statistics.mean(baseline_pc_times) if baseline_pc_times else 0
+        baseline_summary = config_summaries[baseline_config]
+        baseline_mw_avg = baseline_summary.get("get_market_watch_data", {}).get("mean", 0)
+        baseline_pc_avg = baseline_summary.get("get_price_change", {}).get("mean", 0)
         
         print(f"Baseline Performance:")
         print(f"  Market Watch Data: {baseline_mw_avg:.3f}s")
         print(f"  Price Change: {baseline_pc_avg:.3f}s")
         
         print(f"\nOptimization Impact vs Baseline:")
-        for config_key, results in config_groups.items():
+        for config_key, summary in config_summaries.items():
             if config_key != baseline_config:
                 config_name = ", ".join(config_key) if config_key else "baseline"
                 
-                mw_times = [r["execution_time_seconds"] for r in results 
-                           if r["function_name"] == "get_market_watch_data" and r.get("success", False)]
-                pc_times = [r["execution_time_seconds"] for r in results 
-                           if r["function_name"] == "get_price_change" and r.get("success", False)]
+                mw_summary = summary.get("get_market_watch_data")
+                pc_summary = summary.get("get_price_change")
                 
-                if mw_times and baseline_mw_avg > 0:
-                    mw_avg = statistics.mean(mw_times)
+                if mw_summary and baseline_mw_avg > 0:
+                    mw_avg = mw_summary["mean"]
                     mw_improvement = ((baseline_mw_avg - mw_avg) / baseline_mw_avg) * 100
                     print(f"  {config_name}:")
                     print(f"    Market Watch: {mw_avg:.3f}s ({mw_improvement:+.1f}%)")
                 
-                if pc_times and baseline_pc_avg > 0:
-                    pc_avg = statistics.mean(pc_times)
+                if pc_summary and baseline_pc_avg > 0:
+                    pc_avg = pc_summary["mean"]
                     pc_improvement = ((baseline_pc_avg - pc_avg) / baseline_pc_avg) * 100
                     print(f"    Price Change: {pc_avg:.3f}s ({pc_improvement:+.1f}%)")
     
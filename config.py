@@ -2,9 +2,12 @@
 Configuration for the stock-pulse project.
 """
 
+import asyncio
 import os
 from datetime import time
 
+import aiohttp
+import ormsgpack
 import pytz
 import redis.asyncio as redis
 from dotenv import load_dotenv
@@ -30,10 +33,20 @@ DATABASE_PATH = os.path.join(DATA_DIR, "market_watch.db")
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 REDIS_TTL_SECONDS = int(os.getenv("REDIS_TTL_SECONDS", "120"))
 REDIS_ENABLED = os.getenv("REDIS_ENABLED", "true").lower() == "true"
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))
+
+# Redis keys (v2: msgpack-encoded blobs)
+REDIS_SNAPSHOT_KEY = "mw:snapshot:v2"
+REDIS_ADDITIONAL_DATA_KEY = "mw:additional_data:v2"
+
+# Per-instrument hot keys (v2: packed 8-byte doubles); format with the insCode
+REDIS_PRICE_KEY = "mw:inst:{}:price:v2"
+REDIS_PDV_KEY = "mw:inst:{}:pdv:v2"
 
 # Redis client (async) - shared accessor
 _redis = None
 _redis_available = None
+_redis_lock = asyncio.Lock()
 
 
 async def get_redis():
@@ -46,22 +59,76 @@ async def get_redis():
     if _redis_available is False:
         return None
 
-    if _redis is None:
-        try:
-            _redis = await redis.from_url(REDIS_URL, decode_responses=True)
-            # Test connection
-            await _redis.ping()
-            _redis_available = True
-        except Exception as e:
-            if _redis_available is None:  # Only show warning on first failure
-                print(f"Warning: Redis connection failed: {e}")
-            _redis_available = False
-            _redis = None
-            return None
+    if _redis is not None:
+        return _redis
+
+    # Serialize first-time init so concurrent callers don't each build a client
+    async with _redis_lock:
+        if _redis is None and _redis_available is not False:
+            try:
+                # Sized pool; when exhausted, callers fail fast and fall back to the source
+                pool = redis.ConnectionPool.from_url(
+                    REDIS_URL,
+                    max_connections=REDIS_MAX_CONNECTIONS,
+                    socket_keepalive=True,
+                    health_check_interval=30,
+                )
+                client = redis.Redis(connection_pool=pool)
+                # Test connection
+                await client.ping()
+                _redis = client
+                _redis_available = True
+            except Exception as e:
+                if _redis_available is None:  # Only show warning on first failure
+                    print(f"Warning: Redis connection failed: {e}")
+                _redis_available = False
 
     return _redis
 
 
+# Redis value helpers: values are stored as msgpack blobs.
+# Pydantic models are walked natively by ormsgpack; no model_dump() round-trip
+_PACK_OPTS = ormsgpack.OPT_SERIALIZE_PYDANTIC
+
+# (key, decoder) -> (blob, decoded value) for the last blob seen
+_blob_memo = {}
+
+
+def _decode_memo(key: str, blob: bytes, decode):
+    """Decode a Redis blob, reusing the previous result for that key and decoder while the blob is unchanged."""
+    memo_key = (key, decode)
+    cached = _blob_memo.get(memo_key)
+    if cached is not None and cached[0] == blob:
+        return cached[1]
+
+    value = decode(blob)
+    _blob_memo[memo_key] = (blob, value)
+    return value
+
+
+async def cache_get(key: str, decode=ormsgpack.unpackb):
+    """
+    Get and decode a value from Redis; None on miss or when Redis is unavailable.
+
+    Decoded values are memoized per (key, decode) until the stored bytes change,
+    so callers must treat them as read-only.
+    """
+    r = await get_redis()
+    if r is None:
+        return None
+    raw = await r.get(key)
+    return _decode_memo(key, raw, decode) if raw else None
+
+
+async def cache_set(key: str, obj, ex: int = REDIS_TTL_SECONDS) -> bool:
+    """Encode and store a value in Redis; returns False when Redis is unavailable."""
+    r = await get_redis()
+    if r is None:
+        return False
+    await r.set(key, ormsgpack.packb(obj, option=_PACK_OPTS), ex=ex)
+    return True
+
+
 # API configuration
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
@@ -73,6 +140,39 @@ WEBSOCKET_UPDATE_INTERVAL = float(
 
 DEBUG = os.getenv("DEBUG", "false") == "true"
 
+# Request headers for TSETMC: compressed bodies over a persistent connection
+TSETMC_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+    "User-Agent": "stock-pulse/1.0",
+}
+
+# TSETMC HTTP session - one shared keep-alive pool (created lazily inside the running event loop)
+_tsetmc_session = None
+
+
+def get_tsetmc_session() -> aiohttp.ClientSession:
+    """Get the shared TSETMC session, creating it on first use."""
+    global _tsetmc_session
+
+    if _tsetmc_session is None or _tsetmc_session.closed:
+        connector = aiohttp.TCPConnector(limit_per_host=16, ttl_dns_cache=300)
+        _tsetmc_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=30),
+            headers=TSETMC_HEADERS,
+        )
+    return _tsetmc_session
+
+
+async def close_tsetmc_session() -> None:
+    """Close the shared TSETMC session, if one was opened."""
+    global _tsetmc_session
+
+    if _tsetmc_session is not None and not _tsetmc_session.closed:
+        await _tsetmc_session.close()
+    _tsetmc_session = None
+
 # TSETMC MarketWatch base
 TSETMC_BASE = "https://cdn.tsetmc.com/api/ClosingPrice/GetMarketWatch"
 
@@ -9,7 +9,7 @@ from datetime import datetime
 from typing import List, Optional, Dict, Any
 from pathlib import Path
 
-from schemas import MarketWatchItem, MarketWatchResponse, MarketWatchBestLimit
+from schemas import MARKET_WATCH_LIST_ADAPTER, MarketWatchItem, MarketWatchResponse
 from config import DATABASE_PATH
 
 
@@ -237,7 +237,7 @@ class MarketWatchDB:
                 """
             )
             rows = cursor.fetchall()
-            items: List[MarketWatchItem] = []
+            items: List[Dict[str, Any]] = []
             
             # Define column order once - matches SELECT order exactly
             COLUMNS = [
@@ -251,23 +251,13 @@ class MarketWatchDB:
                 # Create dict for clear field access
                 data = dict(zip(COLUMNS, row))
                 
-                # Parse best limits
-                best_limits_data = json.loads(data['best_limits_json'] or '[]')
-                best_limits = [MarketWatchBestLimit(**b) for b in best_limits_data]
-                
-                items.append(MarketWatchItem(
-                    lva=data['lva'], lvc=data['lvc'], eps=data['eps'], pe=data['pe'],
-                    pmd=data['pmd'], pmo=data['pmo'], qtj=data['qtj'], pdv=data['pdv'],
-                    ztt=data['ztt'], qtc=data['qtc'], bv=data['bv'], pc=data['pc'], pcpc=data['pcpc'],
-                    pmn=data['pmn'], pmx=data['pmx'], py=data['py'], pf=data['pf'], pcl=data['pcl'],
-                    vc=data['vc'], csv=data['csv'], insID=data['insID'], pMax=data['pMax'], pMin=data['pMin'],
-                    ztd=data['ztd'], blDs=best_limits, id=0, insCode=data['insCode'],
-                    dEven=data['dEven'], hEven=data['hEven'], pClosing=data['pClosing'],
-                    iClose=data['iClose'], yClose=data['yClose'], pDrCotVal=data['pDrCotVal'],
-                    zTotTran=data['zTotTran'], qTotTran5J=data['qTotTran5J'], qTotCap=data['qTotCap'],
-                    market_type=data['market_type']
-                ))
-            return MarketWatchResponse(marketwatch=items)
+                # Best limits are validated together with their item below
+                data['blDs'] = json.loads(data.pop('best_limits_json') or '[]')
+                data['id'] = 0
+                items.append(data)
+            
+            # Validate all rows in one pydantic-core call
+            return MarketWatchResponse(marketwatch=MARKET_WATCH_LIST_ADAPTER.validate_python(items))
     
     # cleanup_old_data intentionally removed: daily full replace makes cleanup unnecessary
     
@@ -1,53 +1,79 @@
 import asyncio
-import os
 from datetime import datetime
 
 import aiohttp
 import orjson
 
+from config import close_tsetmc_session, get_tsetmc_session
 from schemas import BestLimitsResponse, ClosingPriceResponse, TradeResponse
 from utils import save_json, get_timestamp
 
+_TIMEOUT = aiohttp.ClientTimeout(total=30)
+_PRICE_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+# url -> (ETag, parsed body) for conditional GETs; oldest entries evicted first
+_etag_cache = {}
+_ETAG_CACHE_MAX = 1024
+
+
+async def _conditional_get(session: aiohttp.ClientSession, url: str, timeout: aiohttp.ClientTimeout):
+    """
+    GET a JSON endpoint, revalidating with If-None-Match when we hold an ETag.
+
+    Returns (status, data); a 304 is reported as 200 with the cached body,
+    and data is None for any other non-200 status.
+    """
+    cached = _etag_cache.get(url)
+    headers = {"If-None-Match": cached[0]} if cached is not None else None
+    async with session.get(url, timeout=timeout, headers=headers) as resp:
+        if resp.status == 304 and cached is not None:
+            return 200, cached[1]
+        if resp.status != 200:
+            return resp.status, None
+        raw = await resp.read()
+        etag = resp.headers.get("ETag")
+
+    data = orjson.loads(raw)
+    if etag:
+        _etag_cache.pop(url, None)
+        if len(_etag_cache) >= _ETAG_CACHE_MAX:
+            _etag_cache.pop(next(iter(_etag_cache)))
+        _etag_cache[url] = (etag, data)
+    return 200, data
+
 
 async def fetch_instrument_data(session: aiohttp.ClientSession, url: str) -> dict:
     """Fetch instrument data from TSETMC API."""
-    async with session.get(url, timeout=30) as resp:
-        resp.raise_for_status()
-        raw = await resp.read()
-    return orjson.loads(raw)
+    status, data = await _conditional_get(session, url, _TIMEOUT)
+    if data is None:
+        raise aiohttp.ClientError(f"TSETMC request failed with status {status}: {url}")
+    return data
 
 
 async def get_closing_price_info(ins_code: int) -> dict:
     """Get closing price info for an instrument."""
     url = f"https://cdn.tsetmc.com/api/ClosingPrice/GetClosingPriceInfo/{ins_code}"
-    async with aiohttp.ClientSession() as session:
-        return await fetch_instrument_data(session, url)
+    return await fetch_instrument_data(get_tsetmc_session(), url)
 
 
 async def get_best_limits(ins_code: int) -> dict:
     """Get best limits for an instrument."""
     url = f"https://cdn.tsetmc.com/api/BestLimits/{ins_code}"
-    async with aiohttp.ClientSession() as session:
-        return await fetch_instrument_data(session, url)
+    return await fetch_instrument_data(get_tsetmc_session(), url)
 
 
 async def get_trade(ins_code: int) -> dict:
     """Get trade data for an instrument."""
     url = f"https://cdn.tsetmc.com/api/Trade/GetTrade/{ins_code}"
-    async with aiohttp.ClientSession() as session:
-        return await fetch_instrument_data(session, url)
+    return await fetch_instrument_data(get_tsetmc_session(), url)
 
 
 async def get_price(ins_code: int) -> float:
     """Get price change percentage (pDrCotVal) for a given instrument code."""
     url = f"https://cdn.tsetmc.com/api/ClosingPrice/GetClosingPriceInfo/{ins_code}"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, timeout=10) as resp:
-            if resp.status != 200:
-                raise ValueError(f"Instrument {ins_code} not found")
-            raw = await resp.read()
-    
-    data = orjson.loads(raw)
+    status, data = await _conditional_get(get_tsetmc_session(), url, _PRICE_TIMEOUT)
+    if status != 200:
+        raise ValueError(f"Instrument {ins_code} not found")
     return data["closingPriceInfo"]["pDrCotVal"]
 
 
@@ -57,23 +83,24 @@ async def main():
     ins_code = 28854105556435129
     timestamp = get_timestamp()
 
-    # Create directory structure: export/instrument/{ins_code}/
+    # Directory structure: export/instrument/{ins_code}/
     instrument_code_dir = f"export/instrument/{ins_code}"
-    os.makedirs(instrument_code_dir, exist_ok=True)
 
     # Get data from APIs concurrently
-    async with aiohttp.ClientSession() as session:
+    try:
         data_closing_price_info, data_best_limits, data_trade = await asyncio.gather(
-            fetch_instrument_data(session, f"https://cdn.tsetmc.com/api/ClosingPrice/GetClosingPriceInfo/{ins_code}"),
-            fetch_instrument_data(session, f"https://cdn.tsetmc.com/api/BestLimits/{ins_code}"),
-            fetch_instrument_data(session, f"https://cdn.tsetmc.com/api/Trade/GetTrade/{ins_code}"),
+            get_closing_price_info(ins_code),
+            get_best_limits(ins_code),
+            get_trade(ins_code),
         )
+    finally:
+        await close_tsetmc_session()
 
     # Validate data with schemas
     try:
-        closing_response = ClosingPriceResponse(**data_closing_price_info)
-        best_limits_response = BestLimitsResponse(**data_best_limits)
-        trade_response = TradeResponse(**data_trade)
+        closing_response = ClosingPriceResponse.model_validate(data_closing_price_info)
+        best_limits_response = BestLimitsResponse.model_validate(data_best_limits)
+        trade_response = TradeResponse.model_validate(data_trade)
     except Exception as e:
         print(f"Validation failed: {e}")
         exit(1)
@@ -1,9 +1,14 @@
 import asyncio
+from itertools import chain
+
 import aiohttp
 import orjson
 from utils import save_json, get_timestamp
-from config import MARKETWATCH_URLS
-from schemas import ClientTypeResponse
+from config import MARKETWATCH_URLS, close_tsetmc_session, get_tsetmc_session
+from schemas import CLIENT_TYPE_LIST_ADAPTER, ClientTypeResponse
+
+# Shared request timeout; built once instead of per call
+_TIMEOUT = aiohttp.ClientTimeout(total=30)
 
 
 def _extract_items(data: dict):
@@ -15,7 +20,7 @@ def _extract_items(data: dict):
 
 async def fetch_market_data(session: aiohttp.ClientSession, url: str, market_type: str) -> list:
     """Fetch market data from TSETMC API and tag with market type."""
-    async with session.get(url, timeout=30) as resp:
+    async with session.get(url, timeout=_TIMEOUT) as resp:
         resp.raise_for_status()
         raw = await resp.read()
     data = orjson.loads(raw)
@@ -26,13 +31,12 @@ async def fetch_market_data(session: aiohttp.ClientSession, url: str, market_typ
     return items
 
 
-async def fetch_client_type_data(session: aiohttp.ClientSession) -> dict:
-    """Fetch client type data from TSETMC API."""
+async def fetch_client_type_raw(session: aiohttp.ClientSession) -> bytes:
+    """Fetch the raw client type JSON body from TSETMC API."""
     url = "https://cdn.tsetmc.com/api/ClientType/GetClientTypeAll"
-    async with session.get(url, timeout=30) as resp:
+    async with session.get(url, timeout=_TIMEOUT) as resp:
         resp.raise_for_status()
-        raw = await resp.read()
-    return orjson.loads(raw)
+        return await resp.read()
 
 
 async def fetch_merged_data(urls_dict: dict = None):
@@ -40,35 +44,30 @@ async def fetch_merged_data(urls_dict: dict = None):
     if urls_dict is None:
         urls_dict = MARKETWATCH_URLS
     
-    async with aiohttp.ClientSession() as session:
-        # Create tasks for all URLs in the dict
-        tasks = [
-            fetch_market_data(session, url, market_type)
-            for market_type, url in urls_dict.items()
-        ]
-        
-        # Execute all tasks concurrently
-        results = await asyncio.gather(*tasks)
+    session = get_tsetmc_session()
+    # Create tasks for all URLs in the dict
+    tasks = [
+        fetch_market_data(session, url, market_type)
+        for market_type, url in urls_dict.items()
+    ]
     
-    # Flatten all results into a single list
-    all_items = []
-    for items in results:
-        all_items.extend(items)
+    # Execute all tasks concurrently
+    results = await asyncio.gather(*tasks)
     
+    # Flatten all results into a single list
     return {
-        "marketwatch": all_items,
+        "marketwatch": list(chain.from_iterable(results)),
     }
 
 
 async def fetch_additional_data():
     """Fetch additional data (client type) from TSETMC API."""
-    async with aiohttp.ClientSession() as session:
-        client_type_data = await fetch_client_type_data(session)
+    raw = await fetch_client_type_raw(get_tsetmc_session())
     
-    # Parse and return as dict for easy storage
-    client_type_response = ClientTypeResponse(**client_type_data)
+    # Parse + validate straight from bytes, then return plain dicts for easy storage
+    client_type_response = ClientTypeResponse.model_validate_json(raw)
     return {
-        "additional_data": [item.model_dump() for item in client_type_response.clientTypeAllDto]
+        "additional_data": CLIENT_TYPE_LIST_ADAPTER.dump_python(client_type_response.clientTypeAllDto)
     }
 
 
@@ -77,7 +76,10 @@ async def fetch_additional_data():
 async def main():
     timestamp = get_timestamp()
     export_dir = "export/market_watch"
-    data = await fetch_merged_data()
+    try:
+        data = await fetch_merged_data()
+    finally:
+        await close_tsetmc_session()
     save_path = f"{export_dir}/market_watch_{timestamp}.json"
     save_json(data, save_path)
 
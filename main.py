@@ -1,12 +1,14 @@
 import asyncio
-import json
+import gzip
+import struct
+import time
 from contextlib import asynccontextmanager, suppress
 from datetime import datetime, timedelta
-from typing import List
+from typing import Dict, Optional, Set
 
-import orjson
-from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+import ormsgpack
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, Response
 
 from config import (
     API_HOST,
@@ -17,6 +19,13 @@ from config import (
     get_redis,
     DEBUG,
     REDIS_TTL_SECONDS,
+    REDIS_SNAPSHOT_KEY,
+    REDIS_ADDITIONAL_DATA_KEY,
+    REDIS_PDV_KEY,
+    REDIS_PRICE_KEY,
+    cache_get,
+    cache_set,
+    close_tsetmc_session,
 )
 from database import MarketWatchDB
 from get_instrument_data import get_price
@@ -28,15 +37,71 @@ from utils import is_market_open
 # WebSocket Connection Manager
 class PriceConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
+        # Subscribers and the single tick producer per instrument
+        self.connections_by_code: Dict[str, Set[WebSocket]] = {}
+        self.producers: Dict[str, asyncio.Task] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
+
+    def subscribe(self, ins_code: str, websocket: WebSocket):
+        """Add a socket to an instrument's subscribers, starting its producer if needed."""
+        self.connections_by_code.setdefault(ins_code, set()).add(websocket)
+        task = self.producers.get(ins_code)
+        if task is None or task.done():
+            task = asyncio.create_task(_price_producer(ins_code))
+            task.add_done_callback(lambda t: self.forget_producer(ins_code, t))
+            self.producers[ins_code] = task
+
+    def forget_producer(self, ins_code: str, task: asyncio.Task):
+        # Only drop the entry if it hasn't already been replaced by a newer producer
+        if self.producers.get(ins_code) is task:
+            del self.producers[ins_code]
+
+    def unsubscribe(self, ins_code: str, websocket: WebSocket):
+        conns = self.connections_by_code.get(ins_code)
+        if conns is not None:
+            conns.discard(websocket)
+            if not conns:
+                del self.connections_by_code[ins_code]
+
+    def has_subscribers(self, ins_code: str) -> bool:
+        return ins_code in self.connections_by_code
+
+    async def broadcast(self, ins_code: str, message: str):
+        """
+        Send one message to every subscriber of an instrument.
+
+        Each send is bounded by one update interval so a stalled client can't hold
+        up the others; sockets that fail or time out are dropped and closed.
+        """
+        targets = list(self.connections_by_code.get(ins_code, ()))
+        results = await asyncio.gather(
+            *(asyncio.wait_for(ws.send_text(message), WEBSOCKET_UPDATE_INTERVAL) for ws in targets),
+            return_exceptions=True,
+        )
+        for ws, result in zip(targets, results):
+            if isinstance(result, Exception):
+                self.unsubscribe(ins_code, ws)
+                if isinstance(result, asyncio.TimeoutError):
+                    # Don't wait on a client that can't keep up
+                    asyncio.create_task(_close_quietly(ws, code=1008))
+
+    async def close_subscribers(self, ins_code: str, code: int):
+        """Drop every subscriber of an instrument and close them concurrently (each close bounded)."""
+        targets = self.connections_by_code.pop(ins_code, ())
+        await asyncio.gather(*(_close_quietly(ws, code) for ws in targets))
+
+
+async def _close_quietly(websocket: WebSocket, code: int) -> None:
+    """Best-effort close of a WebSocket, bounded by one update interval."""
+    with suppress(Exception):
+        await asyncio.wait_for(websocket.close(code=code), WEBSOCKET_UPDATE_INTERVAL)
 
 
 manager = PriceConnectionManager()
@@ -47,6 +112,7 @@ async def lifespan(app: FastAPI):
     # initialize shared state
     app.state._last_market_open = None
     app.state._last_snapshot_date = None
+    app.state._market_open_cache = (float("-inf"), False)
     app.state._watcher_task = asyncio.create_task(_market_close_watcher())
     try:
         yield
@@ -54,6 +120,13 @@ async def lifespan(app: FastAPI):
         app.state._watcher_task.cancel()
         with suppress(asyncio.CancelledError):
             await app.state._watcher_task
+        producers = list(manager.producers.values())
+        for task in producers:
+            task.cancel()
+        for task in producers:
+            with suppress(asyncio.CancelledError):
+                await task
+        await close_tsetmc_session()
 
 
 app = FastAPI(
@@ -77,21 +150,19 @@ async def root():
 async def get_market_watch():
     try:
         # Try Redis snapshot first (open/closed)
-        r = await get_redis()
-        if r is not None:
-            try:
-                blob = await r.get("mw:snapshot")
-                if blob:
-                    if DEBUG:
-                        print("marketwatch redis")
-                    return MarketWatchResponse(**json.loads(blob))
-            except Exception:
-                pass
+        try:
+            snapshot = await cache_get(REDIS_SNAPSHOT_KEY, _decode_snapshot)
+            if snapshot is not None:
+                if DEBUG:
+                    print("marketwatch redis")
+                return snapshot
+        except Exception:
+            pass
 
         # Cache miss → fetch from source
-        if is_market_open():
+        if _cached_market_open():
             data_dict = await fetch_merged_data()
-            mw_resp = MarketWatchResponse(**data_dict)
+            mw_resp = MarketWatchResponse.model_validate(data_dict)
             if DEBUG:
                 print("marketwatch live")
         else:
@@ -119,37 +190,33 @@ async def get_market_watch_with_additional_data():
     try:
         # Initialize variables
         mw_resp = None
-        additional_data = None
+        additional_map = None
         mw_from_redis = False
         additional_from_redis = False
         
         # Try Redis for both market watch and additional data
-        r = await get_redis()
-        if r is not None:
-            try:
-                mw_blob = await r.get("mw:snapshot")
-                additional_blob = await r.get("mw:additional_data")
-                
-                if mw_blob:
-                    mw_resp = MarketWatchResponse(**json.loads(mw_blob))
-                    mw_from_redis = True
-                    if DEBUG:
-                        print("marketwatch from redis")
-                
-                if additional_blob:
-                    additional_data = json.loads(additional_blob)
-                    additional_from_redis = True
-                    if DEBUG:
-                        print("additional data from redis")
-                        
-            except Exception:
-                pass
+        try:
+            mw_resp = await cache_get(REDIS_SNAPSHOT_KEY, _decode_snapshot)
+            additional_map = await cache_get(REDIS_ADDITIONAL_DATA_KEY, _decode_additional_map)
+            
+            if mw_resp is not None:
+                mw_from_redis = True
+                if DEBUG:
+                    print("marketwatch from redis")
+            
+            if additional_map is not None:
+                additional_from_redis = True
+                if DEBUG:
+                    print("additional data from redis")
+                    
+        except Exception:
+            pass
         
         # Fetch missing data based on what we have
         if mw_resp is None:
-            if is_market_open():
+            if _cached_market_open():
                 data_dict = await fetch_merged_data()
-                mw_resp = MarketWatchResponse(**data_dict)
+                mw_resp = MarketWatchResponse.model_validate(data_dict)
                 if DEBUG:
                     print("marketwatch from live")
             else:
@@ -160,8 +227,8 @@ async def get_market_watch_with_additional_data():
             # Backfill Redis for market watch
             asyncio.create_task(_backfill_market_watch_async(mw_resp))
         
-        if additional_data is None:
-            if is_market_open():
+        if additional_map is None:
+            if _cached_market_open():
                 additional_data = await fetch_additional_data()
                 if DEBUG:
                     print("additional data from live")
@@ -173,10 +240,9 @@ async def get_market_watch_with_additional_data():
             
             # Backfill Redis for additional data
             asyncio.create_task(_backfill_additional_data_async(additional_data))
+            additional_map = _build_additional_map(additional_data)
         
         # Merge market watch with additional data
-        additional_map = {item["insCode"]: item for item in additional_data.get("additional_data", [])}
-
         merged_items = []
         for market_item in mw_resp.marketwatch:
             item_dict = market_item.model_dump()
@@ -189,11 +255,33 @@ async def get_market_watch_with_additional_data():
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
 
-# WebSocket Endpoints
-@app.get("/ws-test", response_class=HTMLResponse, include_in_schema=False)
-async def websocket_test_page():
-    """Simple HTML page to test WebSocket price updates."""
-    return """
+def _cached_market_open(now=time.monotonic) -> bool:
+    """Return is_market_open(), recomputed at most once per second."""
+    checked_at, market_open = app.state._market_open_cache
+    current = now()
+    if current - checked_at > 1.0:
+        market_open = is_market_open()
+        app.state._market_open_cache = (current, market_open)
+    return market_open
+
+
+def _build_additional_map(additional_data: dict) -> dict:
+    """Index additional data items by insCode."""
+    return {item["insCode"]: item for item in additional_data.get("additional_data", [])}
+
+
+def _decode_snapshot(blob: bytes) -> MarketWatchResponse:
+    """Decode and validate a cached market watch snapshot."""
+    return MarketWatchResponse.model_validate(ormsgpack.unpackb(blob))
+
+
+def _decode_additional_map(blob: bytes) -> dict:
+    """Decode cached additional data straight into its insCode map."""
+    return _build_additional_map(ormsgpack.unpackb(blob))
+
+
+# WebSocket test page, encoded once at import
+_TEST_PAGE_BYTES: bytes = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -314,51 +402,108 @@ async def websocket_test_page():
         </script>
     </body>
     </html>
-    """
+    """.encode("utf-8")
+_TEST_PAGE_GZ: bytes = gzip.compress(_TEST_PAGE_BYTES, mtime=0)
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip (directly or via *), honouring q=0."""
+    wildcard = False
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding == "gzip":
+            return q > 0
+        if coding == "*":
+            wildcard = q > 0
+    return wildcard
+
+
+# WebSocket Endpoints
+@app.get("/ws-test", response_class=HTMLResponse, include_in_schema=False)
+async def websocket_test_page(request: Request):
+    """Simple HTML page to test WebSocket price updates."""
+    if _accepts_gzip(request.headers.get("accept-encoding", "")):
+        return Response(
+            content=_TEST_PAGE_GZ,
+            media_type="text/html",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+    return Response(content=_TEST_PAGE_BYTES, media_type="text/html", headers={"Vary": "Accept-Encoding"})
 
 
 @app.websocket("/ws/price")
 async def price_websocket(websocket: WebSocket, ins_code: str):
     await manager.connect(websocket)
     try:
-        ins_code_int = int(ins_code)
+        try:
+            int(ins_code)
+        except ValueError:
+            await websocket.close(code=1008)
+            return
+        # Ticks come from the shared per-instrument producer; just wait for the client to leave
+        manager.subscribe(ins_code, websocket)
         while True:
-            if is_market_open():
+            # receive() accepts text and binary frames alike; inbound messages are ignored
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.unsubscribe(ins_code, websocket)
+        manager.disconnect(websocket)
+
+
+async def _price_producer(ins_code: str) -> None:
+    """Look up an instrument's price once per tick and broadcast it to all its subscribers."""
+    try:
+        ins_code_int = int(ins_code)
+        # Per-producer constants, built once instead of every tick
+        price_key = REDIS_PRICE_KEY.format(ins_code)
+        pdv_key = REDIS_PDV_KEY.format(ins_code)
+        # Resolve Redis once per producer; the shared pool reconnects dropped connections itself
+        r = await get_redis()
+        # Fixed cadence on the monotonic clock so slow lookups don't stretch the interval
+        next_deadline = time.monotonic()
+        while manager.has_subscribers(ins_code):
+            if _cached_market_open():
                 value = None
-                from_redis = False
-                r = await get_redis()
                 if r is not None:
                     try:
                         if DEBUG:
                             print(f"price from redis: {ins_code}")
-                        v = await r.get(f"mw:inst:{ins_code}:price")
+                        v = await r.get(price_key)
                         if v is not None:
-                            value = float(v)
-                            from_redis = True
+                            value = _unpack_price(v)
                     except Exception:
                         pass
                 if value is None:
                     value = await get_price(ins_code_int)
                     if DEBUG:
                         print(f"price from api: {ins_code}")
-                    r = await get_redis()
                     if r is not None:
                         try:
                             if DEBUG:
                                 print(f"price to redis: {ins_code}")
-                            await r.set(f"mw:inst:{ins_code}:price", str(value), ex=REDIS_TTL_SECONDS)
+                            await r.set(price_key, _pack_price(value), ex=REDIS_TTL_SECONDS)
                         except Exception:
                             pass
             else:
                 value = None
-                from_redis = False
-                r = await get_redis()
                 if r is not None:
                     try:
-                        v = await r.get(f"mw:inst:{ins_code}:pdv")
+                        v = await r.get(pdv_key)
                         if v is not None:
-                            value = float(v)
-                            from_redis = True
+                            value = _unpack_price(v)
                             if DEBUG:
                                 print(f"pdv from redis: {ins_code}")
                     except Exception:
@@ -367,37 +512,54 @@ async def price_websocket(websocket: WebSocket, ins_code: str):
                     value = await asyncio.to_thread(db.get_pdv_by_ins_code, ins_code)
                     if DEBUG:
                         print(f"pdv from db: {ins_code}")
-                    if value is not None:
-                        r = await get_redis()
-                        if r is not None:
-                            try:
-                                await r.set(f"mw:inst:{ins_code}:pdv", str(value), ex=REDIS_TTL_SECONDS)
-                            except Exception:
-                                pass
+                    if value is not None and r is not None:
+                        try:
+                            await r.set(pdv_key, _pack_price(value), ex=REDIS_TTL_SECONDS)
+                        except Exception:
+                            pass
                 if value is None:
                     value = 0.0
 
-            await websocket.send_text(str(value))
-            await asyncio.sleep(WEBSOCKET_UPDATE_INTERVAL)
-    except WebSocketDisconnect:
-        pass
-    finally:
-        manager.disconnect(websocket)
+            await manager.broadcast(ins_code, str(value))
+
+            next_deadline += WEBSOCKET_UPDATE_INTERVAL
+            sleep_for = next_deadline - time.monotonic()
+            if sleep_for > 0:
+                await asyncio.sleep(sleep_for)
+            else:
+                # Overran the interval; don't try to catch up with a burst
+                next_deadline = time.monotonic()
+                await asyncio.sleep(0)
+    except Exception as e:
+        # Lookup failed (e.g. unknown instrument); end these subscriptions like a per-client loop would
+        print(f"price producer error for {ins_code}: {e}")
+        # Step aside first so a client joining while the closes are pending starts a fresh producer
+        manager.forget_producer(ins_code, asyncio.current_task())
+        await manager.close_subscribers(ins_code, code=1011)
 
 
 # Helper functions for caching
+def _pack_price(value: float) -> bytes:
+    """Encode a price as 8 raw bytes for Redis."""
+    return struct.pack("<d", value)
+
+
+def _unpack_price(raw: bytes) -> Optional[float]:
+    """Decode a price stored by _pack_price; None (a cache miss) for anything that isn't 8 bytes."""
+    if len(raw) != 8:
+        return None
+    return struct.unpack("<d", raw)[0]
+
+
 async def _backfill_snapshot_async(mw_resp: MarketWatchResponse) -> None:
     """Backfill Redis snapshot and pdv hot keys in the background."""
     try:
-        r = await get_redis()
-        if r is None:
+        if not await cache_set(REDIS_SNAPSHOT_KEY, mw_resp):
             return  # Redis not available
-        # Use the Pydantic model's dict() method for consistency
-        data_dict = mw_resp.model_dump()
-        await r.set("mw:snapshot", orjson.dumps(data_dict), ex=REDIS_TTL_SECONDS)
+        r = await get_redis()
         pipe = r.pipeline()
         for it in mw_resp.marketwatch:
-            pipe.set(f"mw:inst:{it.insCode}:pdv", str(it.pdv), ex=REDIS_TTL_SECONDS)
+            pipe.set(REDIS_PDV_KEY.format(it.insCode), _pack_price(it.pdv), ex=REDIS_TTL_SECONDS)
         await pipe.execute()
     except Exception:
         # best-effort cache write; ignore errors
@@ -407,9 +569,7 @@ async def _backfill_snapshot_async(mw_resp: MarketWatchResponse) -> None:
 async def _backfill_market_watch_async(mw_resp: MarketWatchResponse) -> None:
     """Backfill Redis with market watch data in the background."""
     try:
-        r = await get_redis()
-        await r.set("mw:snapshot", orjson.dumps(mw_resp.model_dump()), ex=REDIS_TTL_SECONDS)
-        if DEBUG:
+        if await cache_set(REDIS_SNAPSHOT_KEY, mw_resp) and DEBUG:
             print("Market watch data backfilled to Redis")
     except Exception as e:
         if DEBUG:
@@ -419,10 +579,7 @@ async def _backfill_market_watch_async(mw_resp: MarketWatchResponse) -> None:
 async def _backfill_additional_data_async(additional_data: dict) -> None:
     """Backfill Redis with additional data in the background."""
     try:
-        r = await get_redis()
-        if r is None:
-            return  # Redis not available
-        await r.set("mw:additional_data", orjson.dumps(additional_data), ex=REDIS_TTL_SECONDS)
+        await cache_set(REDIS_ADDITIONAL_DATA_KEY, additional_data)
     except Exception:
         # best-effort cache write; ignore errors
         pass
@@ -437,27 +594,26 @@ async def _save_snapshot_if_valid():
             f"Market watch data fetched successfully, items: {len(data_dict.get('marketwatch', []))}"
         )
 
-        mw = MarketWatchResponse(**data_dict)
+        mw = MarketWatchResponse.model_validate(data_dict)
 
-        # Persist to DB
-        db.save_market_watch_data(mw)
+        # Persist to DB off the event loop
+        await asyncio.to_thread(db.save_market_watch_data, mw)
         print("Market watch data saved to database")
 
         # Cache in Redis with 2m TTL (best-effort)
-        r = await get_redis()
-        if r is not None:
-            try:
-                await r.set("mw:snapshot", orjson.dumps(data_dict), ex=120)
+        try:
+            if await cache_set(REDIS_SNAPSHOT_KEY, data_dict, ex=120):
                 print("Market watch snapshot saved to Redis")
 
+                r = await get_redis()
                 pipe = r.pipeline()
                 for it in mw.marketwatch:
-                    # store numeric values as strings
-                    pipe.set(f"mw:inst:{it.insCode}:pdv", str(it.pdv), ex=120)
+                    # store prices as packed 8-byte doubles
+                    pipe.set(REDIS_PDV_KEY.format(it.insCode), _pack_price(it.pdv), ex=120)
                 await pipe.execute()
 
-            except Exception as redis_err:
-                print(f"Warning: Redis caching failed: {redis_err}")
+        except Exception as redis_err:
+            print(f"Warning: Redis caching failed: {redis_err}")
     except asyncio.TimeoutError:
         print("Market watch data fetch timed out after 30s - skipping snapshot")
     except Exception as e:
@@ -485,13 +641,11 @@ async def _save_additional_data_if_valid():
                 print(f"Database save failed: {db_err}")
 
             # Cache in Redis with 2m TTL (best-effort)
-            r = await get_redis()
-            if r is not None:
-                try:
-                    await r.set("mw:additional_data", orjson.dumps(additional_data), ex=120)
+            try:
+                if await cache_set(REDIS_ADDITIONAL_DATA_KEY, additional_data, ex=120):
                     print("Additional data saved to Redis")
-                except Exception as redis_err:
-                    print(f"Warning: Redis caching failed: {redis_err}")
+            except Exception as redis_err:
+                print(f"Warning: Redis caching failed: {redis_err}")
         else:
             print("No additional data to save")
     except asyncio.TimeoutError:
@@ -538,8 +692,10 @@ async def _market_close_watcher():
             now_teh = datetime.now(TEHRAN_TZ)
             if app.state._last_snapshot_date != now_teh.date():
                 print(f"Market close time reached. Saving snapshot and additional data...")
-                await _save_snapshot_if_valid()
-                await _save_additional_data_if_valid()
+                # Independent fetches; overlap their network latency
+                await asyncio.gather(
+                    _save_snapshot_if_valid(), _save_additional_data_if_valid()
+                )
                 app.state._last_snapshot_date = now_teh.date()
         except Exception as e:
             print(f"market watcher error: {e}")
@@ -1,11 +1,16 @@
 from typing import Any, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
 # TODO: later we should look about the filed types cus they could be wrong i test it on some samples but that wont garantee it
 
 
-class InstrumentState(BaseModel):
+class Schema(BaseModel):
+    """Base for API schemas: read-only, unknown fields dropped."""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+
+class InstrumentState(Schema):
     idn: int
     dEven: int
     hEven: int
@@ -18,7 +23,7 @@ class InstrumentState(BaseModel):
     cEtavalTitle: str
 
 
-class ClosingPriceInfo(BaseModel):
+class ClosingPriceInfo(Schema):
     instrumentState: InstrumentState
     instrument: Optional[Any] = None
     thirtyDayClosingHistory: Optional[Any] = None
@@ -46,7 +51,7 @@ class ClosingPriceInfo(BaseModel):
     insCode: str
 
 
-class BestLimit(BaseModel):
+class BestLimit(Schema):
     number: int
     qTitMeDem: int
     zOrdMeDem: int
@@ -58,11 +63,11 @@ class BestLimit(BaseModel):
     insCode: Optional[str] = None
 
 
-class BestLimitsResponse(BaseModel):
+class BestLimitsResponse(Schema):
     bestLimits: List[BestLimit]
 
 
-class Trade(BaseModel):
+class Trade(Schema):
     insCode: Optional[str] = None
     dEven: int
     nTran: int
@@ -78,15 +83,15 @@ class Trade(BaseModel):
     canceled: int
 
 
-class TradeResponse(BaseModel):
+class TradeResponse(Schema):
     trade: List[Trade]
 
 
-class ClosingPriceResponse(BaseModel):
+class ClosingPriceResponse(Schema):
     closingPriceInfo: ClosingPriceInfo
 
 
-class MarketWatchBestLimit(BaseModel):
+class MarketWatchBestLimit(Schema):
     n: int
     qmd: int
     zmd: int
@@ -97,7 +102,7 @@ class MarketWatchBestLimit(BaseModel):
     rid: int
 
 
-class MarketWatchItem(BaseModel):
+class MarketWatchItem(Schema):
     lva: str
     lvc: str
     eps: float
@@ -137,19 +142,23 @@ class MarketWatchItem(BaseModel):
     market_type: Optional[str] = None
 
 
-class MarketWatchResponse(BaseModel):
+class MarketWatchResponse(Schema):
     marketwatch: List[MarketWatchItem]
 
 
-class PriceResponse(BaseModel):
+# Built once at import; validates a whole marketwatch list in one call
+MARKET_WATCH_LIST_ADAPTER = TypeAdapter(List[MarketWatchItem])
+
+
+class PriceResponse(Schema):
     pDrCotVal: float
 
 
-class MarketStatusResponse(BaseModel):
+class MarketStatusResponse(Schema):
     is_market_open: bool
 
 
-class ClientTypeItem(BaseModel):
+class ClientTypeItem(Schema):
     insCode: str
     buy_I_Volume: int
     buy_N_Volume: int
@@ -163,14 +172,18 @@ class ClientTypeItem(BaseModel):
     sell_CountN: int
 
 
-class ClientTypeResponse(BaseModel):
+class ClientTypeResponse(Schema):
     clientTypeAllDto: List[ClientTypeItem]
 
 
+# Built once at import; validates/dumps whole lists inside pydantic-core
+CLIENT_TYPE_LIST_ADAPTER = TypeAdapter(List[ClientTypeItem])
+
+
 class MarketWatchItemWithAdditionalData(MarketWatchItem):
     """MarketWatchItem with additional client type information."""
     additional_data: Optional[ClientTypeItem] = None
 
 
-class MarketWatchWithAdditionalDataResponse(BaseModel):
+class MarketWatchWithAdditionalDataResponse(Schema):
     marketwatch: List[MarketWatchItemWithAdditionalData]
@@ -4,24 +4,30 @@ Utility functions for the stock-pulse project.
 
 import os
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Set, Union
 
 import orjson
 
+from config import MARKET_CLOSE_TIME, MARKET_OPEN_TIME, TEHRAN_TZ, TRADING_DAYS
 
-def save_json(data: Any, filepath: str, indent: int = 2) -> None:
+# Directories already created (or confirmed) by the save helpers this process
+_DIR_CACHE: Set[str] = set()
+
+
+def save_json(data: Any, filepath: str, indent: int = 0) -> None:
     """
     Save data to a JSON file using orjson for better performance.
 
     Args:
         data: The data to save (must be JSON serializable)
         filepath: Path to the file to save
-        indent: Number of spaces for indentation (default: 2)
+        indent: Number of spaces for indentation (default: 0, compact)
     """
-    # Ensure directory exists if there's a directory in the path
+    # Ensure directory exists if there's a directory in the path (once per directory)
     directory = os.path.dirname(filepath)
-    if directory:
+    if directory and directory not in _DIR_CACHE:
         os.makedirs(directory, exist_ok=True)
+        _DIR_CACHE.add(directory)
 
     # Use orjson for serialization
     json_bytes = orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
@@ -44,32 +50,45 @@ def load_json(filepath: str) -> Union[Dict, List, Any]:
         return orjson.loads(f.read())
 
 
-def json_dumps(data: Any, indent: int = 2) -> str:
+def json_dumps(data: Any, indent: int = 0) -> str:
     """
     Convert data to JSON string using orjson.
 
     Args:
         data: The data to serialize
-        indent: Number of spaces for indentation (default: 2)
+        indent: Number of spaces for indentation (default: 0, compact)
 
     Returns:
         JSON string
     """
-    json_bytes = orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
-    return json_bytes.decode("utf-8")
+    return json_dumps_bytes(data, indent).decode("utf-8")
 
 
-def json_loads(json_str: str) -> Union[Dict, List, Any]:
+def json_dumps_bytes(data: Any, indent: int = 0) -> bytes:
     """
-    Parse JSON string using orjson.
+    Convert data to UTF-8 JSON bytes using orjson, without decoding to str.
 
     Args:
-        json_str: The JSON string to parse
+        data: The data to serialize
+        indent: Number of spaces for indentation (default: 0, compact)
+
+    Returns:
+        JSON bytes
+    """
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+
+
+def json_loads(json_str: Union[str, bytes, bytearray, memoryview]) -> Union[Dict, List, Any]:
+    """
+    Parse JSON using orjson.
+
+    Args:
+        json_str: The JSON text to parse, as str or bytes-like (no re-encoding)
 
     Returns:
         The parsed data
     """
-    return orjson.loads(json_str.encode("utf-8"))
+    return orjson.loads(json_str)
 
 
 def ensure_directory_exists(directory: str) -> None:
@@ -89,8 +108,6 @@ def get_timestamp() -> str:
     Returns:
         Formatted timestamp string
     """
-    from datetime import datetime
-
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
 
@@ -101,8 +118,6 @@ def get_iso_timestamp() -> str:
     Returns:
         ISO formatted timestamp string
     """
-    from datetime import datetime
-
     return datetime.now().isoformat()
 
 
@@ -120,16 +135,13 @@ def is_market_open(check_time: Optional[datetime] = None) -> bool:
     Returns:
         True if market is open
     """
-    from config import (MARKET_CLOSE_TIME, MARKET_OPEN_TIME, TEHRAN_TZ,
-                        TRADING_DAYS)
-
     if check_time is None:
         check_time = datetime.now(TEHRAN_TZ)
 
-    # Convert to Tehran timezone if needed
+    # Convert to Tehran timezone if needed; datetimes already in the Tehran zone skip the conversion
     if check_time.tzinfo is None:
         check_time = TEHRAN_TZ.localize(check_time)
-    elif check_time.tzinfo != TEHRAN_TZ:
+    elif getattr(check_time.tzinfo, "zone", None) != TEHRAN_TZ.zone:
         check_time = check_time.astimezone(TEHRAN_TZ)
 
     # Check if it's a trading day